@@ -4,16 +4,21 @@ HKEX New Listings Monitor with Telegram Alerts
 Monitors the HKEX News API for new IPO listings and sends Telegram notifications
 """
 
-import json
 import asyncio
 import logging
+import os
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import Set, List, Dict, Any, Optional
-import requests
-from telegram import Bot
+from typing import Set, FrozenSet, List, Dict, Any, Optional, Callable, Tuple, Union
+import aiohttp
+import msgspec
+import orjson
+import simdjson
+from pyroaring import BitMap
+import xxhash
 from telegram.constants import ParseMode
+from telegram.ext import AIORateLimiter, ExtBot
 
 # Setup logging
 logging.basicConfig(
@@ -26,131 +31,359 @@ logger = logging.getLogger(__name__)
 # File paths
 CONFIG_FILE = Path("config.json")
 STATE_FILE = Path("listings_state.json")
+SEEN_IDS_FILE = Path("seen_ids.rbm")
+JOURNAL_FILE = Path("state_journal.ndjson")
+
+# Returned by fetch_listings when the payload is the same as last poll
+LISTINGS_UNCHANGED = object()
+
+DEFAULT_API_URL = "https://www1.hkexnews.hk/ncms/json/eds/appactive_app_sehk_c.json"
+
+
+class Config(msgspec.Struct):
+    """Settings read from config.json"""
+
+    telegram_bot_token: str
+    telegram_chat_id: Union[str, int]
+    poll_interval_seconds: int = 60
+    api_url: str = DEFAULT_API_URL
+
+
+# Telegram message scaffolding
+_DOC_BASE_URL = "https://www1.hkexnews.hk/app/"
+_STATUS_MAP = {
+    "A": "Active (Application Proof)",
+    "I": "Inactive",
+    "W": "Withdrawn",
+}
+_MSG_BODY_TEMPLATE = """**Company:** {company}
+**Listing Date:** {listing_date}
+**Status:** {status}
+**ID:** `{listing_id}`
+**Posted:** {posting_date}
+**Has PHIP:** {has_phip}
+
+📄 **Documents:**
+{doc_links}{pre_sub_section}
+
+[View All Listings](https://www1.hkexnews.hk/app/appindex.html?lang=zh)
+
+_Detected at: {detected_at}_"""
+# Headers are baked in so formatting needs no per-call branch on alert type
+_NEW_TEMPLATE = "🚨 **New HKEX Listing Detected!**\n\n" + _MSG_BODY_TEMPLATE
+_UPDATE_TEMPLATE = "🔄 **HKEX Listing Document Update!**\n\n" + _MSG_BODY_TEMPLATE
+_DETECTED_AT_FORMAT = "%Y-%m-%d %H:%M:%S"
+_PRE_SUB_TEMPLATE = """
+
+📑 **前提交文件:**
+{links}"""
+
+# A listing to alert on, with its "[name](url)" document links prebuilt
+Alert = Tuple[Dict[str, Any], List[str]]
+
+# Bursts larger than this are collapsed into a single digest message
+BATCH_THRESHOLD = 5
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+_DIGEST_NEW_HEADER = "🚨 **{count} New HKEX Listings Detected!**"
+_DIGEST_UPDATE_HEADER = "🔄 **{count} HKEX Listing Document Updates!**"
+_DIGEST_FOOTER = (
+    "[View All Listings](https://www1.hkexnews.hk/app/appindex.html?lang=zh)"
+)
 
 
 class HKEXMonitor:
     def __init__(self):
         self.config = self._load_config()
-        self.bot = Bot(token=self.config["telegram_bot_token"])
-        self.chat_id = self.config["telegram_chat_id"]
-        self.poll_interval = self.config.get("poll_interval_seconds", 60)
-        self.api_url = self.config.get(
-            "api_url",
-            "https://www1.hkexnews.hk/ncms/json/eds/appactive_app_sehk_c.json",
+        # Rate limiter paces sends to Telegram's global and per-chat limits
+        self.bot = ExtBot(
+            token=self.config.telegram_bot_token,
+            rate_limiter=AIORateLimiter(max_retries=3),
         )
-        self.seen_ids: Set[int] = set()
-        self.listing_docs: Dict[int, Set[str]] = {}  # {listing_id: {doc_url}}
+        self.chat_id = self.config.telegram_chat_id
+        self.poll_interval = self.config.poll_interval_seconds
+        self.api_url = self.config.api_url
+        self.seen_ids: BitMap = BitMap()
+        # {listing_id: {xxh3_64(doc_url)}} - only identity of docs matters
+        self.listing_docs: Dict[int, FrozenSet[int]] = {}
         self.docs_tracking_initialized: bool = (
             False  # Flag to track if docs tracking is ready
         )
+        self._http: Optional[aiohttp.ClientSession] = None
+        # Validators from the last 200 response, sent back to get a 304
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._last_body_hash: Optional[int] = None
+        # Background snapshot write started by the previous cycle, if any
+        self._pending_save: Optional[asyncio.Task] = None
+        # "Detected at" stamp shared by every alert in a check cycle
+        self._detected_at: str = datetime.now().strftime(_DETECTED_AT_FORMAT)
+        self._format_new = self._make_formatter(_NEW_TEMPLATE)
+        self._format_update = self._make_formatter(_UPDATE_TEMPLATE)
         self._load_state()
+        # Append-only journal of per-listing changes since the last snapshot
+        self._journal_fd = os.open(
+            JOURNAL_FILE, os.O_APPEND | os.O_WRONLY | os.O_CREAT, 0o644
+        )
 
-    def _load_config(self) -> Dict[str, Any]:
-        """Load configuration from config.json"""
+    def _load_config(self) -> Config:
+        """Load and validate configuration from config.json"""
         try:
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                config = json.load(f)
+            config = msgspec.json.decode(CONFIG_FILE.read_bytes(), type=Config)
 
-            # Validate required fields
-            if config.get("telegram_bot_token") == "YOUR_BOT_TOKEN_HERE":
+            # Reject the placeholders from config.json.example
+            if config.telegram_bot_token == "YOUR_BOT_TOKEN_HERE":
                 raise ValueError("Please set your Telegram bot token in config.json")
-            if config.get("telegram_chat_id") == "YOUR_CHAT_ID_HERE":
+            if config.telegram_chat_id == "YOUR_CHAT_ID_HERE":
                 raise ValueError("Please set your Telegram chat ID in config.json")
 
             return config
         except FileNotFoundError:
             logger.error(f"Config file not found: {CONFIG_FILE}")
             raise
-        except json.JSONDecodeError as e:
+        except msgspec.ValidationError as e:
+            logger.error(f"Invalid config: {e}")
+            raise
+        except msgspec.DecodeError as e:
             logger.error(f"Invalid JSON in config file: {e}")
             raise
 
     def _load_state(self) -> None:
         """Load previously seen listing IDs and documents from state file"""
+        self.seen_ids = BitMap()
+        if SEEN_IDS_FILE.exists():
+            try:
+                self.seen_ids = BitMap.deserialize(SEEN_IDS_FILE.read_bytes())
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not load seen IDs file: {e}")
+
         if STATE_FILE.exists():
             try:
-                with open(STATE_FILE, "r", encoding="utf-8") as f:
-                    state = json.load(f)
-                    self.seen_ids = set(state.get("seen_ids", []))
+                with open(STATE_FILE, "rb") as f:
+                    state = orjson.loads(f.read())
+                    # Older snapshots listed seen IDs inline
+                    self.seen_ids.update(state.get("seen_ids", []))
                     # Load documents per listing
                     docs_data = state.get("listing_docs", {})
-                    self.listing_docs = {int(k): set(v) for k, v in docs_data.items()}
-                    # Flag to check if document tracking was already initialized
-                    self.docs_tracking_initialized = len(self.listing_docs) > 0
-                    logger.info(
-                        f"Loaded {len(self.seen_ids)} previously seen listings, "
-                        f"{len(self.listing_docs)} with document tracking, "
-                        f"tracking_initialized: {self.docs_tracking_initialized}"
-                    )
-            except (json.JSONDecodeError, KeyError) as e:
+                    self.listing_docs = {
+                        int(k): self._normalize_doc_keys(v)
+                        for k, v in docs_data.items()
+                    }
+            except (orjson.JSONDecodeError, KeyError) as e:
                 logger.warning(f"Could not load state file: {e}")
-                self.seen_ids = set()
                 self.listing_docs = {}
-                self.docs_tracking_initialized = False
         else:
             logger.info("No state file found, starting fresh")
-            self.seen_ids = set()
             self.listing_docs = {}
 
+        self._replay_journal()
+
+        # Flag to check if document tracking was already initialized
+        self.docs_tracking_initialized = len(self.listing_docs) > 0
+        logger.info(
+            f"Loaded {len(self.seen_ids)} previously seen listings, "
+            f"{len(self.listing_docs)} with document tracking, "
+            f"tracking_initialized: {self.docs_tracking_initialized}"
+        )
+
+    def _replay_journal(self) -> None:
+        """Apply changes recorded in the journal on top of the loaded snapshot"""
+        if not JOURNAL_FILE.exists():
+            return
+        replayed = 0
+        offset = 0
+        good_end = 0  # Byte offset just past the last good entry
+        terminated = True  # Whether the last good entry ends with a newline
+        with open(JOURNAL_FILE, "rb") as f:
+            for line in f:
+                offset += len(line)
+                try:
+                    entry = orjson.loads(line)
+                    listing_id = entry["id"]
+                except (orjson.JSONDecodeError, KeyError) as e:
+                    logger.warning(f"Skipping bad journal entry: {e}")
+                    continue
+                self.seen_ids.add(listing_id)
+                self.listing_docs[listing_id] = self._normalize_doc_keys(
+                    entry.get("docs", [])
+                )
+                replayed += 1
+                good_end = offset
+                terminated = line.endswith(b"\n")
+        if replayed:
+            logger.info(f"Replayed {replayed} journal entries")
+
+        # Repair the tail before appending, or the next entry would be glued
+        # onto a torn line from a crash mid-write and lost on the next replay
+        if good_end < offset or not terminated:
+            with open(JOURNAL_FILE, "r+b") as f:
+                f.truncate(good_end)
+                if not terminated:
+                    f.seek(good_end)
+                    f.write(b"\n")
+            logger.warning(f"Repaired journal tail at byte {good_end}")
+
+    @staticmethod
+    def _doc_key(doc_url: str) -> int:
+        """Hash a document URL to a stable 64-bit key"""
+        return xxhash.xxh3_64_intdigest(doc_url.encode())
+
+    @staticmethod
+    def _full_url(doc_url: str) -> str:
+        """Resolve a document path from the API to an absolute URL"""
+        return doc_url if doc_url.startswith("http") else _DOC_BASE_URL + doc_url
+
+    def _normalize_doc_keys(self, values: List[Any]) -> FrozenSet[int]:
+        """Build a doc-key set from stored values, hashing legacy URL entries"""
+        return frozenset(v if isinstance(v, int) else self._doc_key(v) for v in values)
+
+    def _journal_append(self, listing_id: int, doc_keys: FrozenSet[int]) -> None:
+        """Record a new listing or changed document set in the journal"""
+        try:
+            os.write(
+                self._journal_fd,
+                orjson.dumps({"id": listing_id, "docs": list(doc_keys)}) + b"\n",
+            )
+        except OSError as e:
+            logger.error(f"Failed to write state journal: {e}")
+
+    def _needs_compaction(self) -> bool:
+        """Check whether the journal has outgrown the snapshot"""
+        try:
+            journal_size = os.fstat(self._journal_fd).st_size
+            snapshot_size = STATE_FILE.stat().st_size if STATE_FILE.exists() else 0
+        except OSError as e:
+            logger.error(f"Failed to stat state files: {e}")
+            return False
+        return journal_size > 2 * snapshot_size
+
+    async def _wait_for_pending_save(self) -> None:
+        """Wait for a background snapshot to finish before touching state"""
+        if self._pending_save is not None:
+            await self._pending_save
+            self._pending_save = None
+
     def _save_state(self) -> None:
-        """Save current seen IDs and documents to state file"""
+        """Save a snapshot of seen IDs and documents, then truncate the journal"""
         state = {
-            "last_check": datetime.now().isoformat(),
-            "seen_ids": list(self.seen_ids),
+            "last_check": datetime.now(),
             "total_seen": len(self.seen_ids),
-            "listing_docs": {str(k): list(v) for k, v in self.listing_docs.items()},
+            # orjson can't encode sets; int keys are handled by OPT_NON_STR_KEYS
+            "listing_docs": {k: list(v) for k, v in self.listing_docs.items()},
         }
         try:
-            with open(STATE_FILE, "w", encoding="utf-8") as f:
-                json.dump(state, f, ensure_ascii=False, indent=2)
+            # Seen IDs go to a compact roaring bitmap sidecar
+            self._write_atomic(SEEN_IDS_FILE, self.seen_ids.serialize())
+            self._write_atomic(
+                STATE_FILE,
+                orjson.dumps(
+                    state, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+                ),
+            )
+            # Everything in the journal is now covered by the snapshot
+            os.ftruncate(self._journal_fd, 0)
         except Exception as e:
             logger.error(f"Failed to save state: {e}")
 
-    def fetch_listings(self) -> Optional[List[Dict[str, Any]]]:
-        """Fetch current listings from HKEX API"""
-        try:
-            # Add cache-busting timestamp
-            timestamp = int(time.time() * 1000)
-            url = f"{self.api_url}?_={timestamp}"
-
-            headers = {
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        """Write data to a temp file and rename it over path in one step"""
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    async def setup(self) -> None:
+        """Open the HTTP session reused across polls and initialize the bot"""
+        await self.bot.initialize()
+        self._http = aiohttp.ClientSession(
+            headers={
                 "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
                 "Accept": "application/json",
-            }
-
-            logger.info(f"Fetching listings from HKEX API...")
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
+            },
+            timeout=aiohttp.ClientTimeout(total=30),
+        )
 
-            data = response.json()
+    async def fetch_listings(self) -> Union[List[Dict[str, Any]], object, None]:
+        """Fetch current listings from HKEX API"""
+        try:
+            # Rely on conditional requests so unchanged polls get an empty 304
+            url = self.api_url
+            headers = {}
+            if self._etag:
+                headers["If-None-Match"] = self._etag
+            if self._last_modified:
+                headers["If-Modified-Since"] = self._last_modified
+            if self._last_body_hash is not None and not headers:
+                # Server sent no validators; bust caches to avoid stale copies
+                url = f"{self.api_url}?_={int(time.time() * 1000)}"
+
+            logger.info("Fetching listings from HKEX API...")
+            async with self._http.get(url, headers=headers) as response:
+                if response.status == 304:
+                    logger.info("Listings unchanged since last fetch (304)")
+                    return LISTINGS_UNCHANGED
+                response.raise_for_status()
+                body = await response.read()
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+
+            # Same bytes as last time: nothing to parse or detect
+            body_hash = xxhash.xxh3_64_intdigest(body)
+            if body_hash == self._last_body_hash:
+                logger.info("Listings unchanged since last fetch (same body)")
+                return LISTINGS_UNCHANGED
+
+            # Lazily decoded: only fields that are read get materialized.
+            # A fresh parser per body, since pysimdjson refuses to reuse a
+            # parser while proxies from its previous document are alive.
+            data = simdjson.Parser().parse(body)
             listings = data.get("app", [])
 
-            logger.info(f"Fetched {len(listings)} listings from API")
+            self._etag = etag
+            self._last_modified = last_modified
+            self._last_body_hash = body_hash
+
+            logger.info("Fetched %d listings from API", len(listings))
             return listings
 
-        except requests.RequestException as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             logger.error(f"Failed to fetch listings: {e}")
             return None
-        except json.JSONDecodeError as e:
+        except ValueError as e:
             logger.error(f"Failed to parse API response: {e}")
             return None
 
-    def _extract_doc_keys(self, listing: Dict[str, Any]) -> Set[str]:
-        """Extract unique document identifiers from a listing"""
+    def _scan_docs(
+        self, listing: Dict[str, Any]
+    ) -> Tuple[Set[int], List[Tuple[Dict[str, Any], str]]]:
+        """Walk a listing's documents once, returning doc keys and (link, url) pairs"""
         doc_keys = set()
+        docs = []
         for link in listing.get("ls", []):
+            # Prioritize u2 (多檔案 HTML link), fall back to u1 (全文檔案 PDF)
             doc_url = link.get("u2", "") or link.get("u1", "")
             if doc_url:
-                doc_keys.add(doc_url)
-        return doc_keys
+                doc_keys.add(self._doc_key(doc_url))
+                docs.append((link, doc_url))
+        return doc_keys, docs
+
+    def _doc_links(self, docs: List[Tuple[Dict[str, Any], str]]) -> List[str]:
+        """Render "[name](url)" links for documents found by _scan_docs"""
+        # Use nS2 (多檔案) label if available, otherwise fall back to nS1 or nF
+        return [
+            f"[{link.get('nS2', '') or link.get('nS1', '') or link.get('nF', 'Document')}]"
+            f"({self._full_url(doc_url)})"
+            for link, doc_url in docs
+        ]
 
     def detect_new_listings(
         self, listings: List[Dict[str, Any]]
-    ) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    ) -> Tuple[List[Alert], List[Alert]]:
         """Detect new listings and document updates"""
         new_listings = []
         updated_listings = []
         current_ids = set()
+        new_ids = []
+        updated_doc_counts = {}  # {listing_id: number of new documents}
 
         # Skip sending update alerts if this is first run with document tracking
         skip_update_alerts = not self.docs_tracking_initialized
@@ -161,28 +394,42 @@ class HKEXMonitor:
                 continue
 
             current_ids.add(listing_id)
-            current_doc_keys = self._extract_doc_keys(listing)
+            current_doc_keys, docs = self._scan_docs(listing)
 
             if listing_id not in self.seen_ids:
-                # Completely new listing
-                new_listings.append(listing)
-                logger.info(f"New listing: {listing.get('a')} (ID: {listing_id})")
+                # Completely new listing; only alerted listings are fully
+                # materialized out of the lazy simdjson proxy
+                new_listings.append((listing.as_dict(), self._doc_links(docs)))
+                new_ids.append(listing_id)
             else:
                 # Existing listing - check for new documents
-                stored_doc_keys = self.listing_docs.get(listing_id, set())
-                new_docs = current_doc_keys - stored_doc_keys
+                stored_doc_keys = self.listing_docs.get(listing_id)
+                if current_doc_keys == stored_doc_keys:
+                    # Unchanged (the common case): skip the set difference
+                    continue
+                new_docs = current_doc_keys - (stored_doc_keys or frozenset())
                 if new_docs:
                     # Only add to updated_listings if we should send alerts
                     if not skip_update_alerts:
-                        updated_listings.append(listing)
-                    logger.info(
-                        f"Document update: {listing.get('a')} (ID: {listing_id}) - "
-                        f"{len(new_docs)} new document(s)"
-                        + (" (alert skipped - first run)" if skip_update_alerts else "")
-                    )
+                        updated_listings.append(
+                            (listing.as_dict(), self._doc_links(docs))
+                        )
+                    updated_doc_counts[listing_id] = len(new_docs)
 
             # Update document tracking
+            current_doc_keys = frozenset(current_doc_keys)
             self.listing_docs[listing_id] = current_doc_keys
+            self._journal_append(listing_id, current_doc_keys)
+
+        # Log once per poll rather than once per listing
+        if new_ids:
+            logger.info("New listings (IDs): %s", new_ids)
+        if updated_doc_counts:
+            logger.info(
+                "Document updates (ID: new documents): %s%s",
+                updated_doc_counts,
+                " (alerts skipped - first run)" if skip_update_alerts else "",
+            )
 
         # Update seen IDs with all current listings
         self.seen_ids.update(current_ids)
@@ -199,158 +446,183 @@ class HKEXMonitor:
         )
         if total_changes > 0:
             logger.info(
-                f"Detected {len(new_listings)} new listings, "
-                f"{len(updated_listings)} updated (alerts will be sent)"
+                "Detected %d new listings, %d updated (alerts will be sent)",
+                len(new_listings),
+                len(updated_listings),
             )
         else:
             logger.debug("No new listings or updates detected")
 
         return new_listings, updated_listings
 
-    def format_telegram_message(
-        self, listing: Dict[str, Any], is_update: bool = False
-    ) -> str:
+    def format_telegram_message(self, alert: Alert, is_update: bool = False) -> str:
         """Format a listing into a Telegram message"""
-        company_name = listing.get("a", "Unknown Company")
-        listing_date = listing.get("d", "Unknown Date")
-        status = listing.get("s", "Unknown")
-        listing_id = listing.get("id", "N/A")
-        posting_date = listing.get("postingDate", "Unknown")
-        has_phip = listing.get("hasPhip", False)
-
-        # Build document links
-        doc_links = []
-        links = listing.get("ls", [])
-
-        for link in links:
-            doc_date = link.get("d", "")
-            # Use nS2 (多檔案) label if available, otherwise fall back to nS1 or nF
-            doc_name = (
-                link.get("nS2", "") or link.get("nS1", "") or link.get("nF", "Document")
-            )
-            # Prioritize u2 (多檔案 HTML link), fall back to u1 (全文檔案 PDF)
-            doc_url = link.get("u2", "") or link.get("u1", "")
-
-            if doc_url:
-                # Build full URL
-                if doc_url.startswith("http"):
-                    full_url = doc_url
-                else:
-                    full_url = f"https://www1.hkexnews.hk/app/{doc_url}"
-
-                doc_links.append(f"• [{doc_name}]({full_url})")
+        fmt = self._format_update if is_update else self._format_new
+        return fmt(alert)
 
-        # Build pre-submission document links (ps field)
-        pre_sub_links = []
-        ps_links = listing.get("ps", [])
+    def _make_formatter(self, template: str) -> Callable[[Alert], str]:
+        """Build a message formatter specialized for one message template"""
+        render = template.format_map
 
-        for link in ps_links:
-            doc_date = link.get("d", "")
-            doc_name = link.get("nS1", "前提交文件")
-            doc_url = link.get("u1", "")
+        def fmt(alert: Alert) -> str:
+            return render(self._message_fields(*alert))
 
-            if doc_url:
-                if doc_url.startswith("http"):
-                    full_url = doc_url
-                else:
-                    full_url = f"https://www1.hkexnews.hk/app/{doc_url}"
-
-                pre_sub_links.append(f"• [{doc_name}]({full_url})")
-
-        # Format status
-        status_text = {
-            "A": "Active (Application Proof)",
-            "I": "Inactive",
-            "W": "Withdrawn",
-        }.get(status, status)
-
-        # Change message header based on type
-        if is_update:
-            message_header = "🔄 **HKEX Listing Document Update!**"
-        else:
-            message_header = "🚨 **New HKEX Listing Detected!**"
-
-        # Build message
-        message = f"""{message_header}
+        return fmt
 
-**Company:** {company_name}
-**Listing Date:** {listing_date}
-**Status:** {status_text}
-**ID:** `{listing_id}`
-**Posted:** {posting_date}
-**Has PHIP:** {"Yes" if has_phip else "No"}
+    def _message_fields(
+        self, listing: Dict[str, Any], doc_links: List[str]
+    ) -> Dict[str, Any]:
+        """Collect the template fields for a listing"""
+        # Pre-submission document links (ps field)
+        pre_sub_links = [
+            f"• [{link.get('nS1', '前提交文件')}]({self._full_url(doc_url)})"
+            for link in listing.get("ps", [])
+            if (doc_url := link.get("u1", ""))
+        ]
 
-📄 **Documents:**
-"""
-
-        if doc_links:
-            message += "\n".join(doc_links)
-        else:
-            message += "• No documents available"
-
-        # Add pre-submission documents section if available
-        if pre_sub_links:
-            message += f"""
-
-📑 **前提交文件:**
-{chr(10).join(pre_sub_links)}"""
+        status = listing.get("s", "Unknown")
+        return {
+            "company": listing.get("a", "Unknown Company"),
+            "listing_date": listing.get("d", "Unknown Date"),
+            "status": _STATUS_MAP.get(status, status),
+            "listing_id": listing.get("id", "N/A"),
+            "posting_date": listing.get("postingDate", "Unknown"),
+            "has_phip": "Yes" if listing.get("hasPhip", False) else "No",
+            "doc_links": (
+                "• " + "\n• ".join(doc_links)
+                if doc_links
+                else "• No documents available"
+            ),
+            "pre_sub_section": (
+                _PRE_SUB_TEMPLATE.format(links="\n".join(pre_sub_links))
+                if pre_sub_links
+                else ""
+            ),
+            "detected_at": self._detected_at,
+        }
 
-        message += f"""
+    async def send_telegram_alerts(
+        self, alerts: List[Alert], is_update: bool = False
+    ) -> None:
+        """Send Telegram alerts for new listings or updates"""
+        if len(alerts) > BATCH_THRESHOLD:
+            await self._send_digest(alerts, is_update)
+            return
 
-[View All Listings](https://www1.hkexnews.hk/app/appindex.html?lang=zh)
+        fmt = self._format_update if is_update else self._format_new
+        await asyncio.gather(
+            *(self._send_one(alert, fmt, is_update) for alert in alerts)
+        )
 
-_Detected at: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}_"""
+    async def _send_one(
+        self,
+        alert: Alert,
+        fmt: Callable[[Alert], str],
+        is_update: bool,
+    ) -> None:
+        """Send a single alert; pacing is left to the bot's rate limiter"""
+        listing = alert[0]
+        try:
+            message = fmt(alert)
+            await self.bot.send_message(
+                chat_id=self.chat_id,
+                text=message,
+                parse_mode=ParseMode.MARKDOWN,
+                disable_web_page_preview=False,
+            )
+            logger.info(
+                "Sent %s alert for listing ID %s",
+                "update" if is_update else "new",
+                listing.get("id"),
+            )
+        except Exception as e:
+            logger.error(
+                f"Failed to send Telegram message for listing {listing.get('id')}: {e}"
+            )
 
-        return message
+    def _digest_line(self, alert: Alert) -> str:
+        """Format a one-line digest entry with the listing's primary document"""
+        listing, doc_links = alert
+        line = f"• {listing.get('a', 'Unknown Company')} (`{listing.get('id', 'N/A')}`)"
+        return f"{line} - {doc_links[0]}" if doc_links else line
 
-    async def send_telegram_alerts(
-        self, listings: List[Dict[str, Any]], is_update: bool = False
-    ) -> None:
-        """Send Telegram alerts for new listings or updates"""
-        for listing in listings:
+    def _build_digest(self, alerts: List[Alert], is_update: bool) -> List[str]:
+        """Build digest messages, split to stay under Telegram's length limit"""
+        header = (_DIGEST_UPDATE_HEADER if is_update else _DIGEST_NEW_HEADER).format(
+            count=len(alerts)
+        )
+        messages = []
+        chunk = [header]
+        size = len(header)
+        for line in map(self._digest_line, alerts):
+            # +2 for the joining newline and room for the footer's newline
+            if size + len(line) + len(_DIGEST_FOOTER) + 2 > TELEGRAM_MAX_MESSAGE_LENGTH:
+                messages.append("\n".join(chunk))
+                chunk = []
+                size = 0
+            chunk.append(line)
+            size += len(line) + 1
+        chunk.append(_DIGEST_FOOTER)
+        messages.append("\n".join(chunk))
+        return messages
+
+    async def _send_digest(self, alerts: List[Alert], is_update: bool) -> None:
+        """Send one digest alert covering a burst of listings"""
+        messages = self._build_digest(alerts, is_update)
+        for i, message in enumerate(messages, 1):
             try:
-                message = self.format_telegram_message(listing, is_update=is_update)
                 await self.bot.send_message(
                     chat_id=self.chat_id,
                     text=message,
                     parse_mode=ParseMode.MARKDOWN,
-                    disable_web_page_preview=False,
-                )
-                logger.info(
-                    f"Sent {'update' if is_update else 'new'} alert for listing ID {listing.get('id')}"
+                    disable_web_page_preview=True,
                 )
-
-                # Small delay to avoid hitting rate limits
-                await asyncio.sleep(1)
-
             except Exception as e:
                 logger.error(
-                    f"Failed to send Telegram message for listing {listing.get('id')}: {e}"
+                    f"Failed to send Telegram digest part {i}/{len(messages)}: {e}"
                 )
+        logger.info(
+            "Sent %s digest for %d listings in %d message(s)",
+            "update" if is_update else "new",
+            len(alerts),
+            len(messages),
+        )
 
     async def run_once(self) -> None:
         """Run a single check cycle"""
-        listings = self.fetch_listings()
+        listings = await self.fetch_listings()
 
         if listings is None:
             logger.error("Failed to fetch listings, skipping this cycle")
             return
+        if listings is LISTINGS_UNCHANGED:
+            # State already reflects this payload; skip detection and saving
+            return
 
+        self._detected_at = datetime.now().strftime(_DETECTED_AT_FORMAT)
+
+        # Detection mutates state and the journal, which the snapshot
+        # thread reads and truncates
+        await self._wait_for_pending_save()
         new_listings, updated_listings = self.detect_new_listings(listings)
 
         if new_listings:
-            logger.info(f"Sending alerts for {len(new_listings)} new listings")
+            logger.info("Sending alerts for %d new listings", len(new_listings))
             await self.send_telegram_alerts(new_listings, is_update=False)
 
         if updated_listings:
-            logger.info(f"Sending alerts for {len(updated_listings)} document updates")
+            logger.info("Sending alerts for %d document updates", len(updated_listings))
             await self.send_telegram_alerts(updated_listings, is_update=True)
 
         if not new_listings and not updated_listings:
             logger.info("No new listings or updates to report")
 
-        # Always save state after each check
-        self._save_state()
+        # Changes were journaled during detection; only snapshot when it pays
+        # off, and do it off the event loop so the next sleep starts right away
+        if self._needs_compaction():
+            self._pending_save = asyncio.create_task(
+                asyncio.to_thread(self._save_state)
+            )
 
     async def run_continuous(self) -> None:
         """Run continuous monitoring loop"""
@@ -358,9 +630,10 @@ _Detected at: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}_"""
         logger.info(f"Monitoring {len(self.seen_ids)} previously seen listings")
 
         try:
+            await self.setup()
             while True:
                 await self.run_once()
-                logger.info(f"Sleeping for {self.poll_interval} seconds...")
+                logger.info("Sleeping for %s seconds...", self.poll_interval)
                 await asyncio.sleep(self.poll_interval)
 
         except KeyboardInterrupt:
@@ -369,7 +642,12 @@ _Detected at: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}_"""
             logger.error(f"Unexpected error in monitoring loop: {e}")
             raise
         finally:
+            if self._http is not None:
+                await self._http.close()
+            await self.bot.shutdown()
+            await self._wait_for_pending_save()
             self._save_state()
+            os.close(self._journal_fd)
             logger.info(f"Final state saved. Total seen: {len(self.seen_ids)} listings")
 
 